@@ -0,0 +1,229 @@
+"""
+Numba kernels of the portfolio strategies.
+
+numba is a required dependency. Without it the decorators below turn into
+no-ops so the kernels still give correct results, but as plain Python loops
+that are slower than the talib path they replaced. The fallback exists for
+correctness only, not as a fast path.
+"""
+
+from importlib import import_module
+
+import numpy as np
+
+try:
+    from numba import config, njit, prange
+except ImportError:
+    config = None
+    prange = range
+
+    def njit(*args, **kwargs):
+        """Fallback decorator when numba is not installed, correctness only"""
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+
+        def decorator(func):
+            return func
+
+        return decorator
+
+
+# Threading layers that tolerate concurrent launches, with their backends
+THREADSAFE_LAYERS: dict[str, tuple[str, ...]] = {
+    "threadsafe": ("tbbpool", "omppool"),
+    "tbb": ("tbbpool",),
+    "omp": ("omppool",),
+}
+
+
+def threadsafe_layer_available() -> bool:
+    """Check whether parallel kernels can run on a thread-safe layer"""
+    # The workqueue layer aborts the process with "Concurrent access has been
+    # detected" when two threads launch parallel kernels at once, as the init
+    # thread running load_bars and the event thread running on_tick do.
+    if config is None:
+        return False
+
+    # Pin the default layer choice to a thread-safe one, so a backend that
+    # fails to load raises an error instead of falling back to workqueue
+    if config.THREADING_LAYER == "default":
+        config.THREADING_LAYER = "threadsafe"
+
+    for backend in THREADSAFE_LAYERS.get(config.THREADING_LAYER, ()):
+        try:
+            import_module(f"numba.np.ufunc.{backend}")
+            return True
+        except ImportError:
+            continue
+
+    return False
+
+
+# The parallel driver is only used with a thread-safe layer (tbb or omp) and
+# from PARALLEL_THRESHOLD symbols. The threshold is a rough guess, not
+# benchmarked: below it the thread pool overhead is expected to outweigh the
+# per-row work.
+PARALLEL_ENABLED: bool = threadsafe_layer_available()
+PARALLEL_THRESHOLD: int = 256
+
+
+@njit(
+    "UniTuple(f8, 3)(f4[::1], f4[::1], f4[::1], i8, i8, i8, i8)",
+    cache=True,
+    # No nnan/ninf, short rows return NaN on purpose
+    fastmath={"nsz", "arcp", "contract", "afn", "reassoc"},
+    boundscheck=False,
+    nogil=True
+)
+def _atr_rsi_row(
+    high_row: np.ndarray,
+    low_row: np.ndarray,
+    close_row: np.ndarray,
+    start: int,
+    atr_window: int,
+    atr_ma_window: int,
+    rsi_window: int
+) -> tuple[float, float, float]:
+    """Wilder ATR, moving average of ATR and Wilder RSI of one symbol"""
+    # The row is a ring buffer over time with the oldest value at column start.
+    # Prices are stored as float32 while the running averages are accumulated
+    # in float64. Like talib, a value is NaN when the row holds too few bars
+    # for its window.
+    size: int = close_row.shape[0]
+
+    atr: float = 0.0
+    atr_sum: float = 0.0
+    avg_gain: float = 0.0
+    avg_loss: float = 0.0
+    prev_close: float = np.float64(close_row[start])
+
+    # Wrap the ring index once instead of taking a modulo every step
+    ix: int = start
+    for t in range(1, size):
+        ix += 1
+        if ix == size:
+            ix = 0
+
+        h: float = np.float64(high_row[ix])
+        l: float = np.float64(low_row[ix])
+        c: float = np.float64(close_row[ix])
+
+        tr: float = max(h - l, abs(h - prev_close), abs(l - prev_close))
+        change: float = c - prev_close
+        gain: float = change if change > 0 else 0.0
+        loss: float = -change if change < 0 else 0.0
+        prev_close = c
+
+        # Simple average seed followed by Wilder smoothing
+        if t <= atr_window:
+            atr += tr / atr_window
+        else:
+            atr += (tr - atr) / atr_window
+
+        if t >= atr_window and t >= size - atr_ma_window:
+            atr_sum += atr
+
+        if t <= rsi_window:
+            avg_gain += gain / rsi_window
+            avg_loss += loss / rsi_window
+        else:
+            avg_gain += (gain - avg_gain) / rsi_window
+            avg_loss += (loss - avg_loss) / rsi_window
+
+    # ATR is first defined after atr_window price changes, its moving average
+    # needs atr_ma_window of those values
+    if atr_window >= size:
+        atr = np.nan
+
+    if atr_window + atr_ma_window > size:
+        atr_ma: float = np.nan
+    else:
+        atr_ma = atr_sum / atr_ma_window
+
+    total: float = avg_gain + avg_loss
+    if rsi_window >= size:
+        rsi: float = np.nan
+    elif total > 0:
+        rsi = 100 * avg_gain / total
+    else:
+        rsi = 0.0
+
+    return atr, atr_ma, rsi
+
+
+@njit(
+    "void(f4[:, ::1], f4[:, ::1], f4[:, ::1], i8[::1], i8, i8, i8, f8[::1], f8[::1], f8[::1])",
+    cache=True,
+    boundscheck=False,
+    nogil=True
+)
+def atr_rsi_batch(
+    high: np.ndarray,
+    low: np.ndarray,
+    close: np.ndarray,
+    start: np.ndarray,
+    atr_window: int,
+    atr_ma_window: int,
+    rsi_window: int,
+    atr_last: np.ndarray,
+    atr_ma: np.ndarray,
+    rsi_last: np.ndarray
+) -> None:
+    """Wilder ATR, moving average of ATR and Wilder RSI of every row"""
+    # Rows are symbols and the time axis is contiguous, so each symbol's serial
+    # Wilder recursion walks its own row with unit stride. Each row has its own
+    # oldest column in start. Results are written into the preallocated output
+    # arrays.
+    for i in range(close.shape[0]):
+        atr_last[i], atr_ma[i], rsi_last[i] = _atr_rsi_row(
+            high[i], low[i], close[i], start[i], atr_window, atr_ma_window, rsi_window
+        )
+
+
+@njit(
+    "void(f4[:, ::1], f4[:, ::1], f4[:, ::1], i8[::1], i8, i8, i8, f8[::1], f8[::1], f8[::1])",
+    cache=True,
+    boundscheck=False,
+    nogil=True,
+    parallel=True
+)
+def atr_rsi_batch_parallel(
+    high: np.ndarray,
+    low: np.ndarray,
+    close: np.ndarray,
+    start: np.ndarray,
+    atr_window: int,
+    atr_ma_window: int,
+    rsi_window: int,
+    atr_last: np.ndarray,
+    atr_ma: np.ndarray,
+    rsi_last: np.ndarray
+) -> None:
+    """Same as atr_rsi_batch with the rows spread across threads"""
+    # Symbols share no state and write distinct output slots
+    for i in prange(close.shape[0]):
+        atr_last[i], atr_ma[i], rsi_last[i] = _atr_rsi_row(
+            high[i], low[i], close[i], start[i], atr_window, atr_ma_window, rsi_window
+        )
+
+
+@njit("f8(f8[::1], f8)", cache=True, boundscheck=False, nogil=True)
+def ewm_std(values: np.ndarray, alpha: float) -> float:
+    """Exponentially weighted standard deviation of a series"""
+    # Values are ordered from the oldest, NaN values are skipped
+    mean: float = np.nan
+    var: float = np.nan
+
+    for value in values:
+        if np.isnan(value):
+            continue
+
+        if np.isnan(mean):
+            mean = value
+            var = 0.0
+        else:
+            diff: float = value - mean
+            mean += alpha * diff
+            var = (1 - alpha) * (var + alpha * diff * diff)
+
+    return np.sqrt(var)
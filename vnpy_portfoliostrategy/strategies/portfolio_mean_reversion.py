@@ -1,13 +1,123 @@
 from datetime import datetime
 
-from vnpy.trader.utility import ArrayManager
 from vnpy.trader.object import TickData, BarData
-from vnpy.trader.constant import Direction
+from vnpy.trader.constant import Direction, Interval
 
 from vnpy_portfoliostrategy import StrategyTemplate, StrategyEngine
 from vnpy_portfoliostrategy.utility import PortfolioBarGenerator
-
-import pandas as pd
+from vnpy_portfoliostrategy.strategies._kernels import (
+    PARALLEL_ENABLED,
+    PARALLEL_THRESHOLD,
+    atr_rsi_batch,
+    atr_rsi_batch_parallel,
+    ewm_std
+)
+
+import numpy as np
+
+
+class _SymbolBuffers:
+    """Bar history of all symbols in structure-of-arrays layout"""
+
+    def __init__(self, vt_symbols: list[str], size: int = 100) -> None:
+        """"""
+        self.vt_symbols: list[str] = vt_symbols
+        self.size: int = size
+        self.inited: bool = False
+
+        # One row per symbol, each row is a ring buffer over that symbol's own
+        # bars. Prices are kept in float32 to halve the memory traffic.
+        shape: tuple[int, int] = (len(vt_symbols), size)
+        self.high_array: np.ndarray = np.zeros(shape, dtype=np.float32, order="C")
+        self.low_array: np.ndarray = np.zeros(shape, dtype=np.float32, order="C")
+        self.close_array: np.ndarray = np.zeros(shape, dtype=np.float32, order="C")
+        self.has_bar: np.ndarray = np.zeros(len(vt_symbols), dtype=bool)
+
+        # Latest slice at full precision for order decisions
+        self.bar_high: np.ndarray = np.zeros(len(vt_symbols))
+        self.bar_low: np.ndarray = np.zeros(len(vt_symbols))
+        self.bar_close: np.ndarray = np.zeros(len(vt_symbols))
+
+        # Real bars received per symbol and the oldest column of each row
+        self.bar_count: np.ndarray = np.zeros(len(vt_symbols), dtype=np.int64)
+        self.start: np.ndarray = np.zeros(len(vt_symbols), dtype=np.int64)
+
+        # Indicator outputs are reused across bars
+        self.atr: np.ndarray = np.zeros(len(vt_symbols))
+        self.atr_ma: np.ndarray = np.zeros(len(vt_symbols))
+        self.rsi: np.ndarray = np.zeros(len(vt_symbols))
+
+        # Threads only pay off for wide universes and need a thread-safe layer
+        if PARALLEL_ENABLED and len(vt_symbols) >= PARALLEL_THRESHOLD:
+            self.atr_rsi_kernel = atr_rsi_batch_parallel
+        else:
+            self.atr_rsi_kernel = atr_rsi_batch
+
+    def update_bars(self, bars: dict[str, BarData]) -> None:
+        """Append each bar to the row of its symbol"""
+        size: int = self.size
+
+        # Bind the arrays to locals so the loop avoids repeated attribute loads
+        high_array: np.ndarray = self.high_array
+        low_array: np.ndarray = self.low_array
+        close_array: np.ndarray = self.close_array
+        has_bar: np.ndarray = self.has_bar
+        bar_count: np.ndarray = self.bar_count
+        bar_high: np.ndarray = self.bar_high
+        bar_low: np.ndarray = self.bar_low
+        bar_close: np.ndarray = self.bar_close
+
+        for i, vt_symbol in enumerate(self.vt_symbols):
+            bar: BarData = bars.get(vt_symbol, None)
+            has_bar[i] = bar is not None
+
+            # Symbols missing from the slice keep their history unchanged
+            if not bar:
+                continue
+
+            high_price: float = bar.high_price
+            low_price: float = bar.low_price
+            close_price: float = bar.close_price
+
+            ix: int = bar_count[i] % size
+            bar_count[i] += 1
+
+            bar_high[i] = high_price
+            bar_low[i] = low_price
+            bar_close[i] = close_price
+            high_array[i, ix] = high_price
+            low_array[i, ix] = low_price
+            close_array[i, ix] = close_price
+
+        # Once a row has wrapped its oldest bar sits in the next write column
+        np.remainder(bar_count, size, out=self.start)
+
+        # Same rule as the per-symbol ArrayManager check: the slice is ready once
+        # every symbol in it has filled its window with real bars. Symbols absent
+        # from the slice, such as ones that never trade, do not hold it back.
+        self.inited = bool(np.all(bar_count >= size, where=has_bar))
+
+    def atr_rsi(
+        self,
+        atr_window: int,
+        atr_ma_window: int,
+        rsi_window: int
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Wilder ATR, moving average of ATR and Wilder RSI of all symbols"""
+        self.atr_rsi_kernel(
+            self.high_array,
+            self.low_array,
+            self.close_array,
+            self.start,
+            atr_window,
+            atr_ma_window,
+            rsi_window,
+            self.atr,
+            self.atr_ma,
+            self.rsi
+        )
+
+        return self.atr, self.atr_ma, self.rsi
 
 
 class MeanReversionStrategy(StrategyTemplate):
@@ -22,12 +132,23 @@ class MeanReversionStrategy(StrategyTemplate):
     trailing_percent = 0.8
     portfolio_var = 5_000
     lookback_var = 30
+    var_window = 1
 
     entry_lbound = 0.3
     entry_ubound = 0.7
 
     price_add = 10 # Essentially market order
 
+    atr_window = 22
+    atr_ma_window = 10
+    rsi_window = 5
+    rsi_entry = 16
+    fixed_size = 1
+
+    rsi_buy = 0
+    rsi_sell = 0
+    unit_var = 0.0
+
     parameters = [
         "span_fast",
         "span_slow",
@@ -35,13 +156,19 @@ class MeanReversionStrategy(StrategyTemplate):
         "trailing_percent",
         "portfolio_var",
         "lookback_var",
+        "var_window",
         "entry_lbound",
         "entry_ubound",
+        "atr_window",
+        "atr_ma_window",
+        "rsi_window",
+        "rsi_entry",
+        "fixed_size",
     ]
     variables = [
-        "ema_fast",
-        "ema_slow",
-        "emacd",
+        "rsi_buy",
+        "rsi_sell",
+        "unit_var",
     ]
 
     def __init__(
@@ -54,46 +181,80 @@ class MeanReversionStrategy(StrategyTemplate):
         """构造函数"""
         super().__init__(strategy_engine, strategy_name, vt_symbols, setting)
 
-        self.emacd_data: dict[str, float] = {}
-        self.signal_strength: dict[str, float] = {}
-        self.unit_weights: dict[str, float] = {}
-        self.daily_prices: dict[str, pd.Series] = {}
-        
+        # Fixed symbol order, all per-symbol arrays are indexed by position in it
+        self._sym_list: list[str] = list(self.vt_symbols)
+        self._sym_idx: dict[str, int] = {vt_symbol: i for i, vt_symbol in enumerate(self._sym_list)}
+
+        # Signal strength and unit weight aligned to symbol order
+        self._strength_vec: np.ndarray = np.zeros(len(self._sym_list))
+        self._weight_vec: np.ndarray = np.zeros(len(self._sym_list))
+
+        # Window bar closes ordered from the oldest, one column per symbol
+        self._daily_prices: np.ndarray = np.full(
+            (self.lookback_var + 1, len(self._sym_list)),
+            np.nan,
+            dtype=np.float32,
+            order="C"
+        )
+
+        # Per-symbol trailing stop state
+        self._intra_high: np.ndarray = np.zeros(len(self._sym_list))
+        self._intra_low: np.ndarray = np.full(len(self._sym_list), np.inf)
+        self._pos: np.ndarray = np.zeros(len(self._sym_list))
+
         self.last_tick_time: datetime = None
 
-        self.ams: dict[str, ArrayManager] = {}
-        for vt_symbol in self.vt_symbols:
-            self.ams[vt_symbol] = ArrayManager()
+        self.buffers: _SymbolBuffers = _SymbolBuffers(self._sym_list)
+
+        # 每var_window小时合成一次K线，用于更新组合波动率
+        self.pbg = PortfolioBarGenerator(self.on_bars, self.var_window, self.on_window_bars, Interval.HOUR)
 
-        self.pbg = PortfolioBarGenerator(self.on_bars)
+        self._price_offset: dict[Direction, float] = {
+            Direction.LONG: self.price_add,
+            Direction.SHORT: -self.price_add
+        }
 
     def on_init(self) -> None:
         """Initialize strategy"""
-        
+        self.rsi_buy = 50 + self.rsi_entry
+        self.rsi_sell = 50 - self.rsi_entry
+
         self.load_bars(10)
         self.write_log(f"Portfolio Strategy {self.strategy_name} initialized")
 
+    @property
+    def unit_weights(self) -> dict[str, float]:
+        """Unit weights keyed by vt_symbol"""
+        return dict(zip(self._sym_list, self._weight_vec.tolist()))
+
+    def update_signal_strength(self, vt_symbol: str, strength: float) -> None:
+        """Update signal strength of one symbol"""
+        self._strength_vec[self._sym_idx[vt_symbol]] = strength
+
     def calculate_unit_weights(self) -> dict[str, float]:
         """Calculate unit weights for each symbol"""
-        
-        total_strength = sum(self.signal_strength.values())
-
-        self.unit_weights = {}
-        for vt_symbol, strength in self.signal_strength.items():
-            self.unit_weights[vt_symbol] = strength / total_strength
+        # No signal on any symbol means no allocation
+        total_strength: float = self._strength_vec.sum()
+        if total_strength:
+            self._weight_vec = self._strength_vec / total_strength
+        else:
+            self._weight_vec = np.zeros_like(self._strength_vec)
 
         return self.unit_weights
-        
 
     def calculate_unit_var(self) -> float:
         """Calculate VaR if total portfolio weight sums to 1"""
-        
-        portfolio_return_list = []
-        for vt_symbol, strength in self.signal_strength.items():
-            portfolio_return_list.append(self.daily_prices[vt_symbol] * self.unit_weights[vt_symbol])
-        
-        portfolio_return = pd.concat(portfolio_return_list, axis=1).sum(axis=1)
-        unit_var = portfolio_return.ewm(span=self.lookback_var).std().iloc[-1]
+        prices: np.ndarray = self._daily_prices
+        returns: np.ndarray = np.diff(prices, axis=0) / prices[:-1]
+
+        # Symbols without data yet add nothing, rows without any data are skipped.
+        # Multiplying by the float64 weights gives a float64 return series.
+        valid: np.ndarray = ~np.isnan(returns)
+        portfolio_return: np.ndarray = np.where(valid, returns, 0) @ self._weight_vec
+        portfolio_return[~valid.any(axis=1)] = np.nan
+
+        alpha: float = 2.0 / (self.lookback_var + 1)
+        unit_var = ewm_std(portfolio_return, alpha)
 
         return unit_var
 
@@ -111,65 +272,90 @@ class MeanReversionStrategy(StrategyTemplate):
 
     def on_bars(self, bars: dict[str, BarData]) -> None:
         """K线切片回调"""
-        # 更新K线计算RSI数值
-        for vt_symbol, bar in bars.items():
-            am: ArrayManager = self.ams[vt_symbol]
-            am.update_bar(bar)
-
-        for vt_symbol, bar in bars.items():
-            am: ArrayManager = self.ams[vt_symbol]
-            if not am.inited:
-                return
-
-            atr_array = am.atr(self.atr_window, array=True)
-            self.atr_data[vt_symbol] = atr_array[-1]
-            self.atr_ma[vt_symbol] = atr_array[-self.atr_ma_window:].mean()
-            self.rsi_data[vt_symbol] = am.rsi(self.rsi_window)
-
-            current_pos = self.get_pos(vt_symbol)
-            if current_pos == 0:
-                self.intra_trade_high[vt_symbol] = bar.high_price
-                self.intra_trade_low[vt_symbol] = bar.low_price
-
-                if self.atr_data[vt_symbol] > self.atr_ma[vt_symbol]:
-                    if self.rsi_data[vt_symbol] > self.rsi_buy:
-                        self.set_target(vt_symbol, self.fixed_size)
-                    elif self.rsi_data[vt_symbol] < self.rsi_sell:
-                        self.set_target(vt_symbol, -self.fixed_size)
-                    else:
-                        self.set_target(vt_symbol, 0)
-
-            elif current_pos > 0:
-                self.intra_trade_high[vt_symbol] = max(self.intra_trade_high[vt_symbol], bar.high_price)
-                self.intra_trade_low[vt_symbol] = bar.low_price
-
-                long_stop = self.intra_trade_high[vt_symbol] * (1 - self.trailing_percent / 100)
-
-                if bar.close_price <= long_stop:
-                    self.set_target(vt_symbol, 0)
-
-            elif current_pos < 0:
-                self.intra_trade_low[vt_symbol] = min(self.intra_trade_low[vt_symbol], bar.low_price)
-                self.intra_trade_high[vt_symbol] = bar.high_price
-
-                short_stop = self.intra_trade_low[vt_symbol] * (1 + self.trailing_percent / 100)
-
-                if bar.close_price >= short_stop:
-                    self.set_target(vt_symbol, 0)
+        self.pbg.update_bars(bars)
+
+        # 更新K线序列，切片内合约数据就绪前直接返回
+        self.buffers.update_bars(bars)
+        if not self.buffers.inited:
+            return
+
+        # 循环内用到的参数提前读取为局部变量
+        trail: float = self.trailing_percent * 0.01
+        long_stop_ratio: float = 1 - trail
+        short_stop_ratio: float = 1 + trail
+        rsi_buy: float = self.rsi_buy
+        rsi_sell: float = self.rsi_sell
+        fixed_size: int = self.fixed_size
+
+        # 所有合约一次性计算ATR和RSI
+        self.atr_data, self.atr_ma, self.rsi_data = self.buffers.atr_rsi(
+            self.atr_window,
+            self.atr_ma_window,
+            self.rsi_window
+        )
+
+        entry_mask: np.ndarray = self.atr_data > self.atr_ma
+        entry_targets: np.ndarray = np.select(
+            [self.rsi_data > rsi_buy, self.rsi_data < rsi_sell],
+            [fixed_size, -fixed_size],
+            0
+        )
+
+        # 直接读取缓存的最新K线价格，不再重复遍历bars
+        bar_high: np.ndarray = self.buffers.bar_high
+        bar_low: np.ndarray = self.buffers.bar_low
+        bar_close: np.ndarray = self.buffers.bar_close
+        has_bar: np.ndarray = self.buffers.has_bar
+
+        pos: np.ndarray = self._pos
+        for i, vt_symbol in enumerate(self._sym_list):
+            pos[i] = self.get_pos(vt_symbol)
+
+        # 无K线的合约不做处理
+        flat_mask: np.ndarray = (pos == 0) & has_bar
+        long_mask: np.ndarray = (pos > 0) & has_bar
+        short_mask: np.ndarray = (pos < 0) & has_bar
+
+        # 更新持仓期间最高最低价
+        np.copyto(self._intra_high, bar_high, where=flat_mask | short_mask)
+        np.maximum(self._intra_high, bar_high, out=self._intra_high, where=long_mask)
+        np.copyto(self._intra_low, bar_low, where=flat_mask | long_mask)
+        np.minimum(self._intra_low, bar_low, out=self._intra_low, where=short_mask)
+
+        # 计算移动止损离场
+        long_exit: np.ndarray = long_mask & (bar_close <= self._intra_high * long_stop_ratio)
+        short_exit: np.ndarray = short_mask & (bar_close >= self._intra_low * short_stop_ratio)
+
+        # 汇总所有目标仓位变化后统一设置
+        exit_mask: np.ndarray = long_exit | short_exit
+        update_mask: np.ndarray = (flat_mask & entry_mask) | exit_mask
+        new_targets: np.ndarray = np.where(exit_mask, 0, entry_targets)
+
+        pending: list[tuple[str, int]] = [
+            (self._sym_list[i], int(new_targets[i])) for i in np.flatnonzero(update_mask)
+        ]
+        for vt_symbol, target in pending:
+            self.set_target(vt_symbol, target)
 
         self.rebalance_portfolio(bars)
 
         self.put_event()
 
     def on_window_bars(self, bars: dict[str, BarData]) -> None:
-        pass
-        
+        """Record the latest window bar close of each symbol"""
+        # Symbols without a bar keep the previous close in the new row
+        prices: np.ndarray = self._daily_prices
+        prices[:-1] = prices[1:]
+
+        for i, vt_symbol in enumerate(self._sym_list):
+            bar: BarData = bars.get(vt_symbol, None)
+            if bar:
+                prices[-1, i] = bar.close_price
+
+        self.unit_var = self.calculate_unit_var()
 
     def calculate_price(self, vt_symbol: str, direction: Direction, reference: float) -> float:
         """计算调仓委托价格（支持按需重载实现）"""
-        if direction == Direction.LONG:
-            price: float = reference + self.price_add
-        else:
-            price: float = reference - self.price_add
+        price: float = reference + self._price_offset[direction]
 
         return price